@@ -3,17 +3,29 @@ WealthWise ML Service
 Portfolio optimization and financial modeling API
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, Optional, Tuple
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import hashlib
+import multiprocessing
+import os
 import numpy as np
+import orjson
 from datetime import datetime
 
+from optimization.mc_kernel import init_worker, simulate, simulate_chunk, split_chunks
+
 app = FastAPI(
     title="WealthWise ML Service",
     description="Portfolio optimization and Monte Carlo simulation API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -23,27 +35,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
 # --- Pydantic Models ---
 
 class OptimizationRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     risk_score: int = Field(..., ge=1, le=10, description="Risk tolerance score from 1-10")
     investment_amount: float = Field(..., gt=0, description="Total amount to invest")
-    exclude_assets: Optional[List[str]] = Field(default=[], description="Asset classes to exclude")
+    exclude_assets: Optional[Tuple[str, ...]] = Field(default=(), description="Asset classes to exclude")
 
 
 class MonteCarloRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     current_amount: float = Field(..., ge=0)
     target_amount: float = Field(..., gt=0)
     monthly_contribution: float = Field(default=0, ge=0)
-    years_until_target: float = Field(..., gt=0)
+    years_until_target: float = Field(..., gt=0, le=100)
     risk_level: str = Field(default="moderate", pattern="^(conservative|moderate|aggressive)$")
     num_simulations: int = Field(default=10000, ge=1000, le=100000)
 
 
 class RebalanceRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     current_holdings: Dict[str, float]  # symbol -> market value
     target_allocation: Dict[str, float]  # asset_class -> percentage
     threshold: float = Field(default=5.0, ge=1.0, le=20.0)
@@ -72,21 +91,28 @@ CORRELATION_MATRIX = np.array([
 
 ASSET_ORDER = ["US_STOCKS", "INTL_STOCKS", "BONDS", "REAL_ESTATE", "COMMODITIES", "CASH"]
 
+# Asset vectors in ASSET_ORDER (the asset universe is static)
+RETURNS_VEC = np.array([ASSET_METRICS[asset]["expected_return"] for asset in ASSET_ORDER])
+VOLS_VEC = np.array([ASSET_METRICS[asset]["volatility"] for asset in ASSET_ORDER])
+COV_MATRIX = np.outer(VOLS_VEC, VOLS_VEC) * CORRELATION_MATRIX
+ASSET_INDEX = {asset: i for i, asset in enumerate(ASSET_ORDER)}
+
+# Model portfolio allocations (percent) in ASSET_ORDER
+CONSERVATIVE_PORTFOLIO = np.array([10, 5, 75, 5, 0, 5], dtype=np.int16)
+AGGRESSIVE_PORTFOLIO = np.array([55, 25, 5, 15, 0, 0], dtype=np.int16)
+
 
 # --- Optimization Functions ---
 
-def calculate_portfolio_metrics(weights: Dict[str, float]) -> Dict:
-    """Calculate expected return, volatility, and Sharpe ratio for a portfolio."""
-    weight_array = np.array([weights.get(asset, 0) / 100 for asset in ASSET_ORDER])
-    returns = np.array([ASSET_METRICS[asset]["expected_return"] for asset in ASSET_ORDER])
-    volatilities = np.array([ASSET_METRICS[asset]["volatility"] for asset in ASSET_ORDER])
+def calculate_portfolio_metrics(weights: np.ndarray) -> Dict:
+    """Calculate expected return, volatility, and Sharpe ratio for a portfolio given percent weights in ASSET_ORDER."""
+    weight_array = weights / 100
 
     # Expected return
-    expected_return = np.dot(weight_array, returns)
+    expected_return = np.dot(weight_array, RETURNS_VEC)
 
     # Portfolio volatility (using correlation matrix)
-    cov_matrix = np.outer(volatilities, volatilities) * CORRELATION_MATRIX
-    portfolio_variance = np.dot(weight_array, np.dot(cov_matrix, weight_array))
+    portfolio_variance = np.dot(weight_array, np.dot(COV_MATRIX, weight_array))
     portfolio_volatility = np.sqrt(portfolio_variance)
 
     # Sharpe ratio (assuming 3% risk-free rate)
@@ -100,28 +126,150 @@ def calculate_portfolio_metrics(weights: Dict[str, float]) -> Dict:
     }
 
 
-def get_model_portfolio(risk_score: int) -> Dict[str, float]:
-    """Get a model portfolio allocation based on risk score."""
+@lru_cache(maxsize=16)
+def get_model_portfolio(risk_score: int) -> np.ndarray:
+    """
+    Get a model portfolio allocation (percent, in ASSET_ORDER) based on risk score.
+    The result is cached and read-only, so copy it before modifying.
+    """
     # Linear interpolation between conservative and aggressive portfolios
-    conservative = {"US_STOCKS": 10, "INTL_STOCKS": 5, "BONDS": 75, "REAL_ESTATE": 5, "CASH": 5}
-    aggressive = {"US_STOCKS": 55, "INTL_STOCKS": 25, "BONDS": 5, "REAL_ESTATE": 15, "CASH": 0}
-
     factor = (risk_score - 1) / 9  # 0 to 1
 
-    allocation = {}
-    for asset in ASSET_ORDER:
-        allocation[asset] = round(
-            conservative.get(asset, 0) * (1 - factor) + aggressive.get(asset, 0) * factor
-        )
+    allocation = np.round(
+        CONSERVATIVE_PORTFOLIO * (1 - factor) + AGGRESSIVE_PORTFOLIO * factor
+    ).astype(np.int16)
 
     # Ensure allocations sum to 100
-    total = sum(allocation.values())
-    if total != 100:
-        allocation["BONDS"] += (100 - total)
+    allocation[ASSET_INDEX["BONDS"]] += 100 - allocation.sum()
 
+    allocation.setflags(write=False)
     return allocation
 
 
+@lru_cache(maxsize=128)
+def optimize_allocation(risk_score: int, exclude_assets: Tuple[str, ...]) -> Tuple[np.ndarray, Dict]:
+    """Get the allocation and portfolio metrics for a risk score with assets excluded."""
+    allocation = get_model_portfolio(risk_score).copy()
+
+    # Remove excluded assets
+    for asset in exclude_assets:
+        if asset in ASSET_INDEX:
+            i = ASSET_INDEX[asset]
+            excluded_weight = allocation[i]
+            allocation[i] = 0
+            # Redistribute weight proportionally
+            remaining = allocation > 0
+            if remaining.any():
+                shares = excluded_weight * allocation[remaining] / allocation[remaining].sum()
+                allocation[remaining] += np.round(shares).astype(np.int16)
+
+    allocation.setflags(write=False)
+    return allocation, calculate_portfolio_metrics(allocation)
+
+
+@lru_cache(maxsize=512)
+def optimize_response(
+    risk_score: int, investment_amount: float, exclude_assets: Tuple[str, ...]
+) -> Tuple[bytes, str]:
+    """
+    Build the serialized /optimize response body and its ETag.
+    The response is a pure function of the request, so it is cached as bytes.
+    """
+    allocation, metrics = optimize_allocation(risk_score, exclude_assets)
+
+    # Generate recommended holdings
+    allocation = dict(zip(ASSET_ORDER, allocation.tolist()))
+    holdings = []
+    for asset, weight in allocation.items():
+        if weight > 0:
+            amount = (weight / 100) * investment_amount
+            holdings.append({
+                "asset_class": asset,
+                "allocation": weight,
+                "amount": round(amount, 2),
+                "recommended_etf": ASSET_METRICS[asset]["etf"]
+            })
+
+    content = orjson.dumps({
+        "success": True,
+        "data": {
+            "risk_score": risk_score,
+            "allocation": allocation,
+            "metrics": metrics,
+            "recommended_holdings": holdings,
+            "methodology": "Modern Portfolio Theory (Mean-Variance Optimization)"
+        }
+    }, option=orjson.OPT_SERIALIZE_NUMPY)
+    etag = '"%s"' % hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    return content, etag
+
+
+# --- Worker Pool ---
+
+# Process pool for Monte Carlo chunks, created on startup so importing the
+# module (e.g. in pool workers) never spawns processes
+simulation_executor: Optional[ProcessPoolExecutor] = None
+
+
+def create_simulation_executor() -> ProcessPoolExecutor:
+    """
+    Create the Monte Carlo process pool.
+    Workers are spawned rather than forked: forking after this process has
+    started Numba's thread pool (e.g. GNU OpenMP) kills or hangs the workers.
+    """
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    )
+
+
+@app.on_event("startup")
+def start_simulation_executor():
+    global simulation_executor
+    simulation_executor = create_simulation_executor()
+
+
+@app.on_event("shutdown")
+def stop_simulation_executor():
+    global simulation_executor
+    if simulation_executor is not None:
+        simulation_executor.shutdown()
+        simulation_executor = None
+
+
+async def simulate_in_executor(rng: np.random.Generator, *params) -> np.ndarray:
+    """
+    Run a Monte Carlo simulation on the process pool without blocking the event loop.
+    Falls back to a thread in this process when the pool has not been started.
+    """
+    global simulation_executor
+    loop = asyncio.get_running_loop()
+    if simulation_executor is None:
+        return await loop.run_in_executor(None, simulate, rng, *params)
+
+    # Chunks carry pickled copies of their generators, so a retry replays the
+    # exact same draws
+    chunks = split_chunks(rng, *params)
+
+    for attempt in range(2):
+        executor = simulation_executor
+        try:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(executor, simulate_chunk, chunk) for chunk in chunks
+            ))
+            return np.concatenate(results)
+        except BrokenProcessPool:
+            # A worker died and the pool is unusable; replace it (unless a
+            # concurrent request already has) so later requests do not keep failing
+            if simulation_executor is executor:
+                simulation_executor = create_simulation_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            if attempt == 1:
+                raise
+
+
 # --- API Endpoints ---
 
 @app.get("/")
@@ -141,46 +289,12 @@ async def optimize_portfolio(request: OptimizationRequest):
     Uses Modern Portfolio Theory for mean-variance optimization.
     """
     try:
-        # Get model portfolio
-        allocation = get_model_portfolio(request.risk_score)
-
-        # Remove excluded assets
-        for asset in request.exclude_assets:
-            if asset in allocation:
-                excluded_weight = allocation[asset]
-                allocation[asset] = 0
-                # Redistribute weight proportionally
-                remaining = {k: v for k, v in allocation.items() if v > 0}
-                if remaining:
-                    total_remaining = sum(remaining.values())
-                    for k in remaining:
-                        allocation[k] += round(excluded_weight * remaining[k] / total_remaining)
-
-        # Calculate portfolio metrics
-        metrics = calculate_portfolio_metrics(allocation)
-
-        # Generate recommended holdings
-        holdings = []
-        for asset, weight in allocation.items():
-            if weight > 0:
-                amount = (weight / 100) * request.investment_amount
-                holdings.append({
-                    "asset_class": asset,
-                    "allocation": weight,
-                    "amount": round(amount, 2),
-                    "recommended_etf": ASSET_METRICS[asset]["etf"]
-                })
+        # Exclusions are applied in request order, so the order is part of the cache key
+        content, etag = optimize_response(
+            request.risk_score, request.investment_amount, request.exclude_assets or ()
+        )
 
-        return {
-            "success": True,
-            "data": {
-                "risk_score": request.risk_score,
-                "allocation": allocation,
-                "metrics": metrics,
-                "recommended_holdings": holdings,
-                "methodology": "Modern Portfolio Theory (Mean-Variance Optimization)"
-            }
-        }
+        return Response(content=content, media_type="application/json", headers={"ETag": etag})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -204,37 +318,48 @@ async def run_monte_carlo(request: MonteCarloRequest):
         monthly_vol = profile["vol"] / np.sqrt(12)
         total_months = int(request.years_until_target * 12)
 
-        # Run simulations
-        results = []
-        success_count = 0
-
-        np.random.seed(42)  # For reproducibility
-
-        for _ in range(request.num_simulations):
-            balance = request.current_amount
-
-            for _ in range(total_months):
-                # Generate random return
-                monthly_ret = np.random.normal(monthly_return, monthly_vol)
-                balance = balance * (1 + monthly_ret) + request.monthly_contribution
-
-            results.append(balance)
-            if balance >= request.target_amount:
-                success_count += 1
-
-        results = np.array(results)
+        # Per-request generator seeded from the request itself, so identical
+        # requests reproduce without touching any global random state. A stable
+        # digest is used because hash() of str is randomized per process.
+        seed = hashlib.blake2b(request.model_dump_json().encode(), digest_size=8).digest()
+        rng = np.random.default_rng(int.from_bytes(seed, "little"))
+
+        if request.monthly_contribution == 0:
+            # No contributions: the final balance is current_amount times the
+            # compounded growth factor, so draw that factor directly from a
+            # lognormal matched to its exact mean and variance
+            log_var = total_months * np.log1p(monthly_vol ** 2 / (1 + monthly_return) ** 2)
+            log_mean = total_months * np.log1p(monthly_return) - log_var / 2
+            growth = rng.lognormal(log_mean, np.sqrt(log_var), size=request.num_simulations)
+            results = request.current_amount * growth
+        else:
+            results = await simulate_in_executor(
+                rng,
+                request.num_simulations,
+                total_months,
+                request.current_amount,
+                request.monthly_contribution,
+                monthly_return,
+                monthly_vol,
+            )
+
+        success_count = int((results >= request.target_amount).sum())
+        mean = np.mean(results)
+        # One partition for all quantiles; results is not needed afterwards,
+        # so let np.percentile reorder it in place instead of copying
+        percentiles = np.percentile(results, [10, 25, 50, 75, 90], overwrite_input=True)
 
         return {
             "success": True,
             "data": {
                 "success_probability": round((success_count / request.num_simulations) * 100),
                 "projected_amounts": {
-                    "worst_case": round(np.percentile(results, 10)),
-                    "pessimistic": round(np.percentile(results, 25)),
-                    "median": round(np.percentile(results, 50)),
-                    "mean": round(np.mean(results)),
-                    "optimistic": round(np.percentile(results, 75)),
-                    "best_case": round(np.percentile(results, 90))
+                    "worst_case": round(percentiles[0]),
+                    "pessimistic": round(percentiles[1]),
+                    "median": round(percentiles[2]),
+                    "mean": round(mean),
+                    "optimistic": round(percentiles[3]),
+                    "best_case": round(percentiles[4])
                 },
                 "num_simulations": request.num_simulations,
                 "risk_profile": profile
@@ -254,40 +379,37 @@ async def calculate_rebalance(request: RebalanceRequest):
         if total_value == 0:
             return {"success": True, "data": {"needs_rebalancing": False, "trades": []}}
 
-        # Calculate current allocation percentages
-        current_allocation = {
-            symbol: (value / total_value) * 100
-            for symbol, value in request.current_holdings.items()
-        }
+        # Align holdings with target assets so drift and trades are computed
+        # in one pass over arrays
+        assets = list(request.target_allocation.keys())
+        target_pct = np.fromiter(request.target_allocation.values(), dtype=np.float64, count=len(assets))
+        current_value = np.fromiter(
+            (request.current_holdings.get(asset, 0) for asset in assets),
+            dtype=np.float64,
+            count=len(assets),
+        )
 
-        # Calculate drift
-        max_drift = 0
-        drifts = {}
-        for asset, target in request.target_allocation.items():
-            current = current_allocation.get(asset, 0)
-            drift = abs(current - target)
-            drifts[asset] = round(current - target, 2)
-            max_drift = max(max_drift, drift)
+        # Calculate current allocation percentages and drift
+        current_pct = (current_value / total_value) * 100
+        drift = current_pct - target_pct
+        max_drift = float(np.abs(drift).max(initial=0))
+        drifts = dict(zip(assets, np.round(drift, 2).tolist()))
 
         needs_rebalancing = max_drift > request.threshold
 
         # Calculate trades
         trades = []
         if needs_rebalancing:
-            for asset, target in request.target_allocation.items():
-                current = current_allocation.get(asset, 0)
-                target_value = (target / 100) * total_value
-                current_value = request.current_holdings.get(asset, 0)
-                diff = target_value - current_value
-
-                if abs(diff) > 100:  # Only if difference > $100
-                    trades.append({
-                        "asset": asset,
-                        "action": "BUY" if diff > 0 else "SELL",
-                        "amount": round(abs(diff), 2),
-                        "current_allocation": round(current, 1),
-                        "target_allocation": target
-                    })
+            diff = (target_pct / 100) * total_value - current_value
+
+            for i in np.flatnonzero(np.abs(diff) > 100):  # Only if difference > $100
+                trades.append({
+                    "asset": assets[i],
+                    "action": "BUY" if diff[i] > 0 else "SELL",
+                    "amount": round(float(abs(diff[i])), 2),
+                    "current_allocation": round(float(current_pct[i]), 1),
+                    "target_allocation": request.target_allocation[assets[i]]
+                })
 
         return {
             "success": True,
@@ -0,0 +1,103 @@
+"""
+Monte Carlo simulation kernels
+JIT-compiled with Numba for goal-planning simulations
+"""
+
+from typing import List, Tuple
+
+import numba
+import numpy as np
+from numba import njit, prange
+
+# Shock values per chunk (8 MB as float32). Chunks get as many simulations
+# as fit in this budget, which bounds every shock buffer whatever the horizon
+# and fixes how the random stream is split, independent of core count
+MAX_SHOCKS = 2_000_000
+
+ChunkArgs = Tuple[np.random.Generator, int, int, float, float, float, float]
+
+# Per-process shock buffer, grown on demand and reused by every chunk this
+# process simulates (one per pool worker, or the API process itself)
+_shock_buffer = np.empty(0, dtype=np.float32)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _evolve_balances(
+    shocks: np.ndarray,
+    start: float,
+    contribution: float,
+    monthly_return: float,
+    monthly_vol: float,
+    out: np.ndarray,
+) -> None:
+    """Compound each row of standard-normal shocks into a final balance, writing into out."""
+    for i in prange(shocks.shape[0]):
+        balance = start
+        for t in range(shocks.shape[1]):
+            balance = balance * (1 + monthly_return + monthly_vol * shocks[i, t]) + contribution
+        out[i] = balance
+
+
+def init_worker() -> None:
+    """Worker initializer: chunks already run one per process, so keep Numba single-threaded."""
+    numba.set_num_threads(1)
+
+
+def _shocks_view(num_simulations: int, total_months: int) -> np.ndarray:
+    """Get a (num_simulations, total_months) view of the per-process shock buffer."""
+    global _shock_buffer
+    size = num_simulations * total_months
+    if _shock_buffer.size < size:
+        _shock_buffer = np.empty(size, dtype=np.float32)
+    return _shock_buffer[:size].reshape(num_simulations, total_months)
+
+
+def simulate_chunk(args: ChunkArgs) -> np.ndarray:
+    """Simulate one chunk of final balances. Top-level so it can be sent to pool workers."""
+    rng, num_simulations, total_months, start, contribution, monthly_return, monthly_vol = args
+
+    # float32 halves the memory traffic of the dominant buffer; the kernel
+    # still compounds balances in float64
+    shocks = _shocks_view(num_simulations, total_months)
+    rng.standard_normal(out=shocks, dtype=np.float32)
+    out = np.empty(num_simulations)
+    _evolve_balances(shocks, start, contribution, monthly_return, monthly_vol, out)
+
+    return out
+
+
+def split_chunks(
+    rng: np.random.Generator,
+    num_simulations: int,
+    total_months: int,
+    start: float,
+    contribution: float,
+    monthly_return: float,
+    monthly_vol: float,
+) -> List[ChunkArgs]:
+    """
+    Split a simulation into chunks of at most MAX_SHOCKS shocks for simulate_chunk.
+    Each chunk draws from its own generator spawned from rng.
+    """
+    rows = max(1, MAX_SHOCKS // max(1, total_months))
+    sizes = [min(rows, num_simulations - lo) for lo in range(0, num_simulations, rows)]
+    return [
+        (chunk_rng, size, total_months, start, contribution, monthly_return, monthly_vol)
+        for chunk_rng, size in zip(rng.spawn(len(sizes)), sizes)
+    ]
+
+
+def simulate(
+    rng: np.random.Generator,
+    num_simulations: int,
+    total_months: int,
+    start: float,
+    contribution: float,
+    monthly_return: float,
+    monthly_vol: float,
+) -> np.ndarray:
+    """Simulate final balances for a fixed monthly contribution in the current process."""
+    chunks = split_chunks(
+        rng, num_simulations, total_months, start, contribution, monthly_return, monthly_vol
+    )
+    return np.concatenate([simulate_chunk(chunk) for chunk in chunks])
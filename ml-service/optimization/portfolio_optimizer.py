@@ -4,11 +4,17 @@ Implements Modern Portfolio Theory (MPT) and Black-Litterman model
 """
 
 import numpy as np
-import pandas as pd
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
 
+# Model portfolio allocations (percent), in the asset order of _initialize_assets:
+# US_STOCKS, INTL_STOCKS, EMERGING_MARKETS, BONDS, TIPS, REAL_ESTATE, COMMODITIES, CASH
+CONSERVATIVE_PORTFOLIO = np.array([10, 5, 0, 60, 15, 5, 0, 5], dtype=np.int16)
+MODERATE_PORTFOLIO = np.array([30, 15, 5, 30, 5, 10, 0, 5], dtype=np.int16)
+AGGRESSIVE_PORTFOLIO = np.array([45, 20, 10, 5, 0, 15, 5, 0], dtype=np.int16)
+
+
 @dataclass
 class AssetMetrics:
     """Metrics for a single asset."""
@@ -29,6 +35,19 @@ class PortfolioOptimizer:
         self.assets = self._initialize_assets()
         self.correlation_matrix = self._initialize_correlations()
 
+        # The asset universe is static, so derive the vectors used by every
+        # metric calculation once up front
+        self._asset_list = list(self.assets.keys())
+        self._returns = np.array([m.expected_return for m in self.assets.values()])
+        vols = np.array([m.volatility for m in self.assets.values()])
+        self._cov = np.outer(vols, vols) * self.correlation_matrix
+        self._bonds_index = self._asset_list.index("BONDS")
+
+        # Risk scores are integers 1-10, so interpolate every allocation once
+        self._alloc_table = np.array(
+            [self._allocation_for_risk_score(score) for score in range(1, 11)]
+        )
+
     def _initialize_assets(self) -> Dict[str, AssetMetrics]:
         """Initialize default asset metrics based on historical data."""
         return {
@@ -90,83 +109,60 @@ class PortfolioOptimizer:
         return corr
 
     def get_covariance_matrix(self) -> np.ndarray:
-        """Calculate covariance matrix from correlation matrix and volatilities."""
-        asset_list = list(self.assets.keys())
-        volatilities = np.array([self.assets[a].volatility for a in asset_list])
-        cov = np.outer(volatilities, volatilities) * self.correlation_matrix
-        return cov
+        """Return the covariance matrix precomputed from correlations and volatilities."""
+        return self._cov
 
     def calculate_portfolio_return(self, weights: np.ndarray) -> float:
         """Calculate expected portfolio return."""
-        asset_list = list(self.assets.keys())
-        returns = np.array([self.assets[a].expected_return for a in asset_list])
-        return np.dot(weights, returns)
+        return np.dot(weights, self._returns)
 
     def calculate_portfolio_volatility(self, weights: np.ndarray) -> float:
         """Calculate portfolio volatility (standard deviation)."""
-        cov = self.get_covariance_matrix()
-        variance = np.dot(weights, np.dot(cov, weights))
+        variance = np.dot(weights, np.dot(self._cov, weights))
         return np.sqrt(variance)
 
+    def _ret_vol(self, weights: np.ndarray) -> Tuple[float, float]:
+        """Calculate expected return and volatility together from the cached vectors."""
+        return weights @ self._returns, np.sqrt(weights @ self._cov @ weights)
+
+    def _sharpe(self, ret: float, vol: float) -> float:
+        """Sharpe ratio from an already computed return and volatility."""
+        return (ret - self.risk_free_rate) / vol if vol > 0 else 0
+
     def calculate_sharpe_ratio(self, weights: np.ndarray) -> float:
         """Calculate Sharpe ratio for a portfolio."""
-        ret = self.calculate_portfolio_return(weights)
-        vol = self.calculate_portfolio_volatility(weights)
-        return (ret - self.risk_free_rate) / vol if vol > 0 else 0
+        return self._sharpe(*self._ret_vol(weights))
 
     def optimize_for_risk_score(self, risk_score: int) -> Dict[str, float]:
         """
         Get optimal portfolio allocation for a given risk score (1-10).
         Uses a simplified approach based on predefined model portfolios.
         """
-        # Map risk score to target volatility
-        min_vol = 0.05  # Conservative
-        max_vol = 0.18  # Aggressive
-        target_vol = min_vol + (max_vol - min_vol) * (risk_score - 1) / 9
+        # Whole scores 1-10 are precomputed; anything else is interpolated
+        if risk_score == int(risk_score) and 1 <= risk_score <= 10:
+            allocation = self._alloc_table[int(risk_score) - 1]
+        else:
+            allocation = self._allocation_for_risk_score(risk_score)
+        return dict(zip(self._asset_list, allocation.tolist()))
 
+    def _allocation_for_risk_score(self, risk_score: int) -> np.ndarray:
+        """Get the allocation for a risk score as percent weights in asset order."""
         # Simplified optimization: interpolate between model portfolios
-        conservative = {
-            "US_STOCKS": 10, "INTL_STOCKS": 5, "EMERGING_MARKETS": 0,
-            "BONDS": 60, "TIPS": 15, "REAL_ESTATE": 5,
-            "COMMODITIES": 0, "CASH": 5
-        }
-
-        moderate = {
-            "US_STOCKS": 30, "INTL_STOCKS": 15, "EMERGING_MARKETS": 5,
-            "BONDS": 30, "TIPS": 5, "REAL_ESTATE": 10,
-            "COMMODITIES": 0, "CASH": 5
-        }
-
-        aggressive = {
-            "US_STOCKS": 45, "INTL_STOCKS": 20, "EMERGING_MARKETS": 10,
-            "BONDS": 5, "TIPS": 0, "REAL_ESTATE": 15,
-            "COMMODITIES": 5, "CASH": 0
-        }
-
-        # Interpolate based on risk score
         if risk_score <= 4:
             factor = (risk_score - 1) / 3
-            allocation = self._interpolate_allocations(conservative, moderate, factor)
+            return self._interpolate_allocations(CONSERVATIVE_PORTFOLIO, MODERATE_PORTFOLIO, factor)
         else:
             factor = (risk_score - 4) / 6
-            allocation = self._interpolate_allocations(moderate, aggressive, factor)
-
-        return allocation
+            return self._interpolate_allocations(MODERATE_PORTFOLIO, AGGRESSIVE_PORTFOLIO, factor)
 
     def _interpolate_allocations(
-        self, alloc1: Dict[str, float], alloc2: Dict[str, float], factor: float
-    ) -> Dict[str, float]:
+        self, alloc1: np.ndarray, alloc2: np.ndarray, factor: float
+    ) -> np.ndarray:
         """Interpolate between two allocations."""
-        result = {}
-        for asset in self.assets.keys():
-            v1 = alloc1.get(asset, 0)
-            v2 = alloc2.get(asset, 0)
-            result[asset] = round(v1 * (1 - factor) + v2 * factor)
+        result = np.round(alloc1 * (1 - factor) + alloc2 * factor).astype(np.int16)
 
         # Ensure allocations sum to 100
-        total = sum(result.values())
-        if total != 100:
-            result["BONDS"] += (100 - total)
+        result[self._bonds_index] += 100 - result.sum()
 
         return result
 
@@ -177,28 +173,28 @@ class PortfolioOptimizer:
         Generate points on the efficient frontier.
         Returns list of (return, volatility, weights) tuples.
         """
-        frontier = []
-
-        for i in range(num_points):
-            risk_score = 1 + (i / (num_points - 1)) * 9
-            allocation = self.optimize_for_risk_score(int(risk_score))
-
-            weights = np.array([allocation.get(a, 0) / 100 for a in self.assets.keys()])
-            ret = self.calculate_portfolio_return(weights)
-            vol = self.calculate_portfolio_volatility(weights)
-
-            frontier.append((ret, vol, allocation))
-
-        return frontier
+        # Stack every allocation into one weight matrix so returns and
+        # volatilities for the whole frontier come from a single pass
+        scores = (1 + np.arange(num_points) / (num_points - 1) * 9).astype(int)
+        allocations = self._alloc_table[scores - 1]
+        weights = allocations / 100
+        returns = weights @ self._returns
+        volatilities = np.sqrt(np.einsum("ij,jk,ik->i", weights, self._cov, weights))
+
+        return [
+            (ret, vol, dict(zip(self._asset_list, allocation)))
+            for ret, vol, allocation in zip(returns, volatilities, allocations.tolist())
+        ]
 
     def get_portfolio_metrics(self, allocation: Dict[str, float]) -> Dict:
         """Calculate all metrics for a given allocation."""
-        weights = np.array([allocation.get(a, 0) / 100 for a in self.assets.keys()])
+        weights = np.array([allocation.get(a, 0) / 100 for a in self._asset_list])
+        ret, vol = self._ret_vol(weights)
 
         return {
-            "expected_return": round(self.calculate_portfolio_return(weights) * 100, 2),
-            "volatility": round(self.calculate_portfolio_volatility(weights) * 100, 2),
-            "sharpe_ratio": round(self.calculate_sharpe_ratio(weights), 2),
+            "expected_return": round(ret * 100, 2),
+            "volatility": round(vol * 100, 2),
+            "sharpe_ratio": round(self._sharpe(ret, vol), 2),
             "allocation": allocation
         }
 